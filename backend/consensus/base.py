@@ -2,14 +2,21 @@
 
 DEFAULT_VALIDATORS_COUNT = 5
 DEFAULT_CONSENSUS_SLEEP_TIME = 5
+# Pending transactions are dispatched as soon as they are notified, the sweep is only a safety net for missed notifications
+DEFAULT_RECONCILIATION_SLEEP_TIME = 60
+DEFAULT_LISTENER_RECONNECT_SLEEP_TIME = 5
+# Maximum number of addresses whose transactions are executed at the same time
+DEFAULT_MAX_CONSENSUS_WORKERS = 10
 
 import asyncio
 from collections import deque
+from functools import partial
 import json
 import traceback
 from typing import Callable, Iterator
 
 from sqlalchemy.orm import Session
+from backend.consensus.scheduler import TransactionScheduler
 from backend.consensus.vrf import get_validators_for_transaction
 from backend.database_handler.chain_snapshot import ChainSnapshot
 from backend.database_handler.contract_snapshot import ContractSnapshot
@@ -18,6 +25,10 @@ from backend.database_handler.transactions_processor import (
     TransactionStatus,
 )
 from backend.database_handler.accounts_manager import AccountsManager
+from backend.database_handler.transactions_listener import (
+    PENDING_TRANSACTIONS_CHANNEL,
+    TransactionsListener,
+)
 from backend.database_handler.types import ConsensusData
 from backend.domain.types import (
     Transaction,
@@ -69,30 +80,76 @@ class ConsensusAlgorithm:
         self,
         get_session: Callable[[], Session],
         msg_handler: MessageHandler,
+        transactions_listener: TransactionsListener | None = None,
+        max_workers: int = DEFAULT_MAX_CONSENSUS_WORKERS,
     ):
         self.get_session = get_session
         self.msg_handler = msg_handler
-        self.queues: dict[str, asyncio.Queue] = {}
+        self.transactions_listener = transactions_listener
+        self.scheduler = TransactionScheduler()
+        self.max_workers = max_workers
+        self.workers: dict[str, asyncio.Task] = {}
 
     def run_crawl_snapshot_loop(self):
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        loop.run_until_complete(self._crawl_snapshot())
+        loop.run_until_complete(
+            asyncio.gather(
+                self._listen_pending_transactions(),
+                self._crawl_snapshot(),
+            )
+        )
         loop.close()
 
+    async def _listen_pending_transactions(self):
+        """
+        Enqueues transactions as soon as the `pending_transactions` channel notifies them.
+        The listener reconnects on failure, `_crawl_snapshot` picks up whatever was notified in the meantime.
+        """
+        if self.transactions_listener is None:
+            return
+
+        while True:
+            try:
+                async for notification in self.transactions_listener.listen(
+                    PENDING_TRANSACTIONS_CHANNEL
+                ):
+                    marker = self.scheduler.marker()
+                    with self.get_session() as session:
+                        transaction = TransactionsProcessor(
+                            session
+                        ).get_transaction_by_hash(notification.payload)
+
+                    if (
+                        transaction is None
+                        or transaction["status"] != TransactionStatus.PENDING.value
+                    ):
+                        continue
+
+                    self.scheduler.schedule(
+                        transaction_from_dict(transaction), since=marker
+                    )
+            except Exception as e:
+                print("Error listening to pending transactions", e)
+                print(traceback.format_exc())
+            await asyncio.sleep(DEFAULT_LISTENER_RECONNECT_SLEEP_TIME)
+
     async def _crawl_snapshot(self):
+        sleep_time = (
+            DEFAULT_CONSENSUS_SLEEP_TIME
+            if self.transactions_listener is None
+            else DEFAULT_RECONCILIATION_SLEEP_TIME
+        )
         while True:
+            marker = self.scheduler.marker()
             with self.get_session() as session:
                 chain_snapshot = ChainSnapshot(session)
                 pending_transactions = chain_snapshot.get_pending_transactions()
                 for transaction in pending_transactions:
-                    transaction = transaction_from_dict(transaction)
-                    address = transaction.to_address or transaction.from_address
-
-                    if address not in self.queues:
-                        self.queues[address] = asyncio.Queue()
-                    await self.queues[address].put(transaction)
-            await asyncio.sleep(DEFAULT_CONSENSUS_SLEEP_TIME)
+                    self.scheduler.schedule(
+                        transaction_from_dict(transaction), since=marker
+                    )
+            await asyncio.sleep(sleep_time)
 
     def run_consensus_loop(self):
         loop = asyncio.new_event_loop()
@@ -101,36 +158,73 @@ class ConsensusAlgorithm:
         loop.close()
 
     async def _run_consensus(self):
-        asyncio.set_event_loop(asyncio.new_event_loop())
+        """
+        Keeps one worker per address with pending transactions, up to `max_workers` at the same time.
+        Workers pull the next transaction of their address as soon as the previous one is done, so a slow contract doesn't hold up the others.
+        """
         # watch out! as ollama uses GPU resources and webrequest aka selenium uses RAM
         # TODO: async sessions would be a good idea to not block the current thread
+        loop = asyncio.get_running_loop()
+        work_available = asyncio.Event()
+        self.scheduler.on_schedule(lambda: loop.call_soon_threadsafe(work_available.set))
+
+        def on_worker_done(address: str, _: asyncio.Task):
+            del self.workers[address]
+            work_available.set()
+
         while True:
+            work_available.clear()
+            for address in self.scheduler.ready_addresses():
+                if len(self.workers) >= self.max_workers:
+                    break
+                if address in self.workers:
+                    continue
+                worker = asyncio.create_task(self._run_address_worker(address))
+                self.workers[address] = worker
+                worker.add_done_callback(partial(on_worker_done, address))
+
             try:
-                async with asyncio.TaskGroup() as tg:
-                    for queue in [q for q in self.queues.values() if not q.empty()]:
-                        # sessions cannot be shared between coroutines, we need to create a new session for each coroutine
-                        # https://docs.sqlalchemy.org/en/20/orm/session_basics.html#is-the-session-thread-safe-is-asyncsession-safe-to-share-in-concurrent-tasks
-                        transaction = await queue.get()
-                        with self.get_session() as session:
-
-                            async def exec_transaction_with_session_handling():
-                                await self.exec_transaction(
-                                    transaction,
-                                    TransactionsProcessor(session),
-                                    ChainSnapshot(session),
-                                    AccountsManager(session),
-                                    lambda contract_address, session=session: ContractSnapshot(
-                                        contract_address, session
-                                    ),
-                                )
-                                session.commit()
-
-                            tg.create_task(exec_transaction_with_session_handling())
+                # The timeout is just a safety net, workers and the scheduler wake us up
+                await asyncio.wait_for(
+                    work_available.wait(), timeout=DEFAULT_CONSENSUS_SLEEP_TIME
+                )
+            except TimeoutError:
+                pass
 
-            except Exception as e:
-                print("Error running consensus", e)
-                print(traceback.format_exc())
-            await asyncio.sleep(DEFAULT_CONSENSUS_SLEEP_TIME)
+    async def _run_address_worker(self, address: str):
+        while True:
+            transaction = self.scheduler.pop(address)
+            if transaction is None:
+                return
+
+            await self._exec_transaction_with_session_handling(transaction)
+
+            # Give the slot back if other addresses are waiting for a worker
+            if len(self.workers) >= self.max_workers and any(
+                other not in self.workers for other in self.scheduler.ready_addresses()
+            ):
+                return
+
+    async def _exec_transaction_with_session_handling(self, transaction: Transaction):
+        try:
+            # sessions cannot be shared between coroutines, we need to create a new session for each coroutine
+            # https://docs.sqlalchemy.org/en/20/orm/session_basics.html#is-the-session-thread-safe-is-asyncsession-safe-to-share-in-concurrent-tasks
+            with self.get_session() as session:
+                await self.exec_transaction(
+                    transaction,
+                    TransactionsProcessor(session),
+                    ChainSnapshot(session),
+                    AccountsManager(session),
+                    lambda contract_address, session=session: ContractSnapshot(
+                        contract_address, session
+                    ),
+                )
+                session.commit()
+        except Exception as e:
+            print("Error running consensus", e)
+            print(traceback.format_exc())
+        finally:
+            self.scheduler.done(transaction)
 
     async def exec_transaction(
         self,
@@ -154,16 +248,6 @@ class ConsensusAlgorithm:
         msg_handler = self.msg_handler.with_client_session(
             transaction.client_session_id
         )
-        if (
-            transactions_processor.get_transaction_by_hash(transaction.hash)["status"]
-            != TransactionStatus.PENDING.value
-        ):
-            # This is a patch for a TOCTOU problem we have https://github.com/yeagerai/genlayer-simulator/issues/387
-            # Problem: Pending transactions are checked by `_crawl_snapshot`, which appends them to queues. These queues are consumed by `_run_consensus`, which processes the transactions. This means that a transaction can be processed multiple times, since `_crawl_snapshot` can append the same transaction to the queue multiple times.
-            # Partial solution: This patch checks if the transaction is still pending before processing it. This is not the best solution, but we'll probably refactor the whole consensus algorithm in the short term.
-            print(" ~ ~ ~ ~ ~ TRANSACTION ALREADY IN PROCESS: ", transaction)
-            return
-
         print(" ~ ~ ~ ~ ~ EXECUTING TRANSACTION: ", transaction)
 
         # If transaction is a transfer, execute it
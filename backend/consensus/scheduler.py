@@ -0,0 +1,131 @@
+# backend/consensus/scheduler.py
+
+from collections import OrderedDict, deque
+import threading
+from typing import Callable
+
+from backend.domain.types import Transaction
+
+DEFAULT_FINISHED_TRANSACTIONS_MEMORY = 10_000
+
+
+def get_transaction_address(transaction: Transaction) -> str:
+    """Address whose queue the transaction belongs to, transactions on the same address are executed in order."""
+    return transaction.to_address or transaction.from_address
+
+
+class TransactionScheduler:
+    """
+    Per-address queues of transactions waiting for consensus.
+
+    Guarantees that each transaction is dispatched once: hashes are tracked while they are queued or in flight, and finished hashes are remembered so that a stale read (a sweep or a notification that loaded the transaction before it was finished) can't schedule it again.
+    Queues are evicted as soon as their address has nothing queued nor in flight.
+
+    Transactions are scheduled from the crawl thread and consumed from the consensus thread, so every method is guarded by a lock.
+    """
+
+    def __init__(
+        self, finished_transactions_memory: int = DEFAULT_FINISHED_TRANSACTIONS_MEMORY
+    ):
+        self._lock = threading.Lock()
+        self._clock = 0
+        self._queues: dict[str, deque[Transaction]] = {}
+        self._queued: set[str] = set()
+        self._in_flight: dict[str, str] = {}  # hash -> address
+        self._in_flight_per_address: dict[str, int] = {}
+        self._finished: OrderedDict[str, int] = OrderedDict()  # hash -> clock
+        self._finished_transactions_memory = finished_transactions_memory
+        self._on_schedule: Callable[[], None] | None = None
+
+    def on_schedule(self, callback: Callable[[], None] | None):
+        """Registers a callback invoked, from the scheduling thread, every time a transaction is queued."""
+        self._on_schedule = callback
+
+    def marker(self) -> int:
+        """
+        Returns a marker to be taken **before** reading pending transactions from the database.
+        Passing it to `schedule` discards transactions that were finished after the read started.
+        """
+        with self._lock:
+            self._clock += 1
+            return self._clock
+
+    def schedule(self, transaction: Transaction, since: int | None = None) -> bool:
+        """Queues the transaction, returns False if it's already queued, in flight or was finished after `since`."""
+        with self._lock:
+            if transaction.hash in self._queued or transaction.hash in self._in_flight:
+                return False
+
+            finished_at = self._finished.get(transaction.hash)
+            if finished_at is not None and (since is None or finished_at >= since):
+                return False
+
+            address = get_transaction_address(transaction)
+            self._queues.setdefault(address, deque()).append(transaction)
+            self._queued.add(transaction.hash)
+
+        if self._on_schedule is not None:
+            self._on_schedule()
+        return True
+
+    def pop(self, address: str) -> Transaction | None:
+        """Takes the next transaction of the address and marks it as in flight."""
+        with self._lock:
+            queue = self._queues.get(address)
+            if not queue:
+                return None
+
+            transaction = queue.popleft()
+            # Move the address to the back so that `ready_addresses` lists the least recently served first
+            self._queues[address] = self._queues.pop(address)
+            self._queued.remove(transaction.hash)
+            self._in_flight[transaction.hash] = address
+            self._in_flight_per_address[address] = (
+                self._in_flight_per_address.get(address, 0) + 1
+            )
+            return transaction
+
+    def done(self, transaction: Transaction):
+        """Marks an in flight transaction as finished, evicting its address queue if it became idle."""
+        with self._lock:
+            address = self._in_flight.pop(transaction.hash, None)
+
+            self._clock += 1
+            self._finished[transaction.hash] = self._clock
+            self._finished.move_to_end(transaction.hash)
+            while len(self._finished) > self._finished_transactions_memory:
+                self._finished.popitem(last=False)
+
+            if address is None:
+                return
+
+            self._in_flight_per_address[address] -= 1
+            if self._in_flight_per_address[address] == 0:
+                del self._in_flight_per_address[address]
+                if not self._queues.get(address):
+                    self._queues.pop(address, None)
+
+    def has_in_flight(self, address: str) -> bool:
+        with self._lock:
+            return address in self._in_flight_per_address
+
+    def ready_addresses(self) -> list[str]:
+        """Addresses with queued transactions and nothing in flight, least recently served first."""
+        with self._lock:
+            return [
+                address
+                for address, queue in self._queues.items()
+                if queue and address not in self._in_flight_per_address
+            ]
+
+    def queue_depth(self, address: str) -> int:
+        with self._lock:
+            return len(self._queues.get(address, ()))
+
+    def queue_depths(self) -> dict[str, int]:
+        with self._lock:
+            return {address: len(queue) for address, queue in self._queues.items()}
+
+    def in_flight_count(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
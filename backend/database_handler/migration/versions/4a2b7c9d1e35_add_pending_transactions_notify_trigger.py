@@ -0,0 +1,46 @@
+"""add pending transactions notify trigger
+
+Revision ID: 4a2b7c9d1e35
+Revises: b5acc405bcca
+Create Date: 2024-10-08 09:12:31.402117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4a2b7c9d1e35"
+down_revision: Union[str, None] = "b5acc405bcca"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Notifies the consensus listener every time a transaction becomes PENDING, the payload is the transaction hash
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_pending_transaction() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('pending_transactions', NEW.hash);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER pending_transaction_notify
+        AFTER INSERT OR UPDATE OF status ON transactions
+        FOR EACH ROW
+        WHEN (NEW.status = 'PENDING')
+        EXECUTE FUNCTION notify_pending_transaction();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS pending_transaction_notify ON transactions;")
+    op.execute("DROP FUNCTION IF EXISTS notify_pending_transaction();")
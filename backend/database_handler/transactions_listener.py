@@ -0,0 +1,49 @@
+# database_handler/transactions_listener.py
+
+import asyncio
+from typing import AsyncIterator
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, Notify
+from sqlalchemy import Engine
+
+# Channel fed by the `notify_pending_transaction` trigger, the payload is the transaction hash
+PENDING_TRANSACTIONS_CHANNEL = "pending_transactions"
+
+
+class TransactionsListener:
+    """
+    Subscribes to Postgres `LISTEN/NOTIFY` channels and yields the notifications as they arrive.
+
+    Notifications are only delivered once the notifying transaction is committed, so consumers can safely read the rows they refer to.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    async def listen(self, *channels: str) -> AsyncIterator[Notify]:
+        # The connection is detached from the pool since we switch it to autocommit and keep it open for as long as we listen
+        connection = self.engine.raw_connection()
+        connection.detach()
+        try:
+            dbapi_connection = connection.dbapi_connection
+            dbapi_connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with dbapi_connection.cursor() as cursor:
+                for channel in channels:
+                    cursor.execute(f"LISTEN {channel};")
+
+            notifications: asyncio.Queue[Notify] = asyncio.Queue()
+
+            def on_readable():
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notifications.put_nowait(dbapi_connection.notifies.pop(0))
+
+            loop = asyncio.get_running_loop()
+            loop.add_reader(dbapi_connection.fileno(), on_readable)
+            try:
+                while True:
+                    yield await notifications.get()
+            finally:
+                loop.remove_reader(dbapi_connection.fileno())
+        finally:
+            connection.close()
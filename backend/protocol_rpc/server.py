@@ -20,7 +20,8 @@ from dotenv import load_dotenv
 from backend.database_handler.transactions_processor import TransactionsProcessor
 from backend.database_handler.validators_registry import ValidatorsRegistry
 from backend.database_handler.accounts_manager import AccountsManager
-from backend.consensus.base import ConsensusAlgorithm
+from backend.database_handler.transactions_listener import TransactionsListener
+from backend.consensus.base import ConsensusAlgorithm, DEFAULT_MAX_CONSENSUS_WORKERS
 from backend.database_handler.models import Base
 
 
@@ -59,7 +60,12 @@ def create_app():
     validators_registry = ValidatorsRegistry(sqlalchemy_db.session)
     llm_provider_registry = LLMProviderRegistry(sqlalchemy_db.session)
     consensus = ConsensusAlgorithm(
-        lambda: Session(engine, expire_on_commit=False), msg_handler
+        lambda: Session(engine, expire_on_commit=False),
+        msg_handler,
+        TransactionsListener(engine),
+        max_workers=int(
+            environ.get("CONSENSUS_MAX_WORKERS", DEFAULT_MAX_CONSENSUS_WORKERS)
+        ),
     )
     return (
         app,
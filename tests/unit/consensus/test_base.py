@@ -1,3 +1,4 @@
+import asyncio
 from collections import defaultdict
 from typing import Callable
 from unittest.mock import AsyncMock, Mock
@@ -432,3 +433,46 @@ def test_rotate():
 
     with pytest.raises(StopIteration):
         next(iterator)
+
+
+@pytest.mark.asyncio
+async def test_run_consensus_workers_drain_queues_continuously():
+    """
+    Tests that workers pull the next transaction of their address as soon as the previous one is done,
+    and that the global cap on workers is respected
+    """
+    consensus = ConsensusAlgorithm(None, Mock(MessageHandler), max_workers=1)
+
+    transactions = [
+        Transaction(
+            hash=f"transaction_hash_{i}",
+            from_address="from_address",
+            to_address=to_address,
+            status=TransactionStatus.PENDING,
+            type=TransactionType.RUN_CONTRACT,
+        )
+        for i, to_address in enumerate(["address1", "address1", "address2"])
+    ]
+    for transaction in transactions:
+        consensus.scheduler.schedule(transaction)
+
+    executed = []
+    all_executed = asyncio.Event()
+
+    async def exec_transaction(transaction: Transaction):
+        assert len(consensus.workers) <= 1
+        executed.append(transaction.hash)
+        consensus.scheduler.done(transaction)
+        if len(executed) == len(transactions):
+            all_executed.set()
+
+    consensus._exec_transaction_with_session_handling = exec_transaction
+
+    run_consensus = asyncio.create_task(consensus._run_consensus())
+    await asyncio.wait_for(all_executed.wait(), timeout=1)
+    run_consensus.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await run_consensus
+
+    assert sorted(executed) == [transaction.hash for transaction in transactions]
+    assert executed.index("transaction_hash_0") < executed.index("transaction_hash_1")
@@ -0,0 +1,73 @@
+from backend.consensus.scheduler import TransactionScheduler
+from backend.database_handler.models import TransactionStatus
+from backend.domain.types import Transaction, TransactionType
+
+
+def transaction(hash: str, to_address: str = "contract") -> Transaction:
+    return Transaction(
+        hash=hash,
+        status=TransactionStatus.PENDING,
+        type=TransactionType.RUN_CONTRACT,
+        from_address="sender",
+        to_address=to_address,
+    )
+
+
+def test_schedule_deduplicates_queued_and_in_flight():
+    scheduler = TransactionScheduler()
+
+    assert scheduler.schedule(transaction("0x1"))
+    assert not scheduler.schedule(transaction("0x1"))
+    assert scheduler.queue_depth("contract") == 1
+
+    assert scheduler.pop("contract").hash == "0x1"
+    assert not scheduler.schedule(transaction("0x1"))
+    assert scheduler.queue_depth("contract") == 0
+    assert scheduler.has_in_flight("contract")
+
+
+def test_finished_transactions_are_not_rescheduled_by_stale_reads():
+    scheduler = TransactionScheduler()
+
+    stale_marker = scheduler.marker()
+    scheduler.schedule(transaction("0x1"), since=stale_marker)
+    scheduler.done(scheduler.pop("contract"))
+
+    # A sweep that started reading before the transaction was finished
+    assert not scheduler.schedule(transaction("0x1"), since=stale_marker)
+
+    # A sweep that started reading afterwards still sees it pending, so it must be retried
+    assert scheduler.schedule(transaction("0x1"), since=scheduler.marker())
+
+
+def test_ready_addresses_and_eviction():
+    scheduler = TransactionScheduler()
+
+    scheduler.schedule(transaction("0x1", "contract_a"))
+    scheduler.schedule(transaction("0x2", "contract_a"))
+    scheduler.schedule(transaction("0x3", "contract_b"))
+
+    assert scheduler.ready_addresses() == ["contract_a", "contract_b"]
+    assert scheduler.queue_depths() == {"contract_a": 2, "contract_b": 1}
+
+    first = scheduler.pop("contract_a")
+    assert scheduler.ready_addresses() == ["contract_b"]
+
+    scheduler.done(first)
+    # contract_a was served last
+    assert scheduler.ready_addresses() == ["contract_b", "contract_a"]
+
+    scheduler.done(scheduler.pop("contract_b"))
+    assert scheduler.queue_depths() == {"contract_a": 1}
+    assert scheduler.in_flight_count() == 0
+
+
+def test_finished_transactions_memory_is_bounded():
+    scheduler = TransactionScheduler(finished_transactions_memory=1)
+
+    for hash in ["0x1", "0x2"]:
+        scheduler.schedule(transaction(hash))
+        scheduler.done(scheduler.pop("contract"))
+
+    assert scheduler.schedule(transaction("0x1"))
+    assert not scheduler.schedule(transaction("0x2"))